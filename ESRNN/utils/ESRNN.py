@@ -1,5 +1,6 @@
 import torch
 import torch.nn as nn
+from torch.utils.checkpoint import checkpoint
 from ESRNN.utils.DRNN import DRNN
 import numpy as np
 
@@ -115,13 +116,13 @@ class _ESM(_ES):
     lev_sms = torch.sigmoid(embeds[:, 0])
 
     # Initialize seasonalities
-    seas_prod = torch.ones(len(y[:,0])).to(y.device)
+    seas_prod = 1.0
     #seasonalities1 = torch.jit.annotate(List[Tensor], [])
     #seasonalities2 = torch.jit.annotate(List[Tensor], [])
     seasonalities1 = []
     seasonalities2 = []
-    seas_sms1 = torch.ones(1).to(y.device)
-    seas_sms2 = torch.ones(1).to(y.device)
+    seas_sms1 = None
+    seas_sms2 = None
 
     if len(self.seasonality)>0:
       seas_sms1 = torch.sigmoid(embeds[:, 1])
@@ -153,11 +154,13 @@ class _ESM(_ES):
     n_time = len(ys)
     for t in range(1, n_time):
 
-      seas_prod_t = torch.ones(len(y[:,t])).to(y.device)
-      if len(self.seasonality)>0:
-        seas_prod_t = seas_prod_t * seasonalities1[t]
+      # No per-step ones allocation nor host to device copy
       if len(self.seasonality)==2:
-        seas_prod_t = seas_prod_t * seasonalities2[t]
+        seas_prod_t = seasonalities1[t] * seasonalities2[t]
+      elif len(self.seasonality)==1:
+        seas_prod_t = seasonalities1[t]
+      else:
+        seas_prod_t = 1.0
 
       newlev = lev_sms * (ys[t] / seas_prod_t) + (1-lev_sms) * levels[t-1]
       levels += [newlev]
@@ -246,9 +249,17 @@ class _RNN(nn.Module):
     self.adapterW  = nn.Linear(mc.state_hsize, mc.output_size)
 
   def forward(self, input_data):
+    # Recompute each dilated block on backward instead of storing
+    # its activations, trading FLOPs for peak memory
+    checkpointing = self.mc.gradient_checkpointing and self.training
+
     for layer_num in range(len(self.rnn_stack)):
       residual = input_data
-      output, _ = self.rnn_stack[layer_num](input_data)
+      if checkpointing:
+        output, _ = checkpoint(self.rnn_stack[layer_num], input_data,
+                               use_reentrant=False)
+      else:
+        output, _ = self.rnn_stack[layer_num](input_data)
       if layer_num > 0:
         output += residual
       input_data = output
@@ -1,4 +1,22 @@
 class ModelConfig(object):
+  # Slotted attributes make the self.mc.* reads in the hot training
+  # loops C-level slot accesses instead of instance dict lookups
+  __slots__ = ('max_epochs', 'batch_size', 'batch_size_test', 'freq_of_test',
+               'learning_rate', 'lr_scheduler_step_size', 'lr_decay',
+               'per_series_lr_multip', 'gradient_eps',
+               'gradient_clipping_threshold', 'rnn_weight_decay', 'noise_std',
+               'level_variability_penalty', 'testing_percentile',
+               'training_percentile', 'ensemble', 'use_prefetch', 'precision',
+               'device', 'cell_type', 'state_hsize', 'dilations',
+               'add_nl_layer', 'gradient_checkpointing', 'random_seed',
+               'seasonality', 'naive_seasonality', 'input_size',
+               'input_size_i', 'output_size', 'output_size_i', 'frequency',
+               'min_series_length', 'max_series_length', 'max_periods',
+               'root_dir',
+               # assigned after construction, during fit/save
+               'category_to_idx', 'exogenous_size', 'n_series',
+               'dataset_name', 'copy')
+
   def __init__(self, max_epochs, batch_size, batch_size_test, freq_of_test,
                learning_rate, lr_scheduler_step_size, lr_decay,
                per_series_lr_multip, gradient_eps, gradient_clipping_threshold,
@@ -8,7 +26,9 @@ class ModelConfig(object):
                testing_percentile, training_percentile, ensemble,
                cell_type,
                state_hsize, dilations, add_nl_layer, seasonality, input_size, output_size, 
-               frequency, max_periods, random_seed, device, root_dir):
+               frequency, max_periods, random_seed, device, root_dir,
+               use_prefetch=False, gradient_checkpointing=False,
+               precision='fp32'):
 
     # Train Parameters
     self.max_epochs = max_epochs
@@ -27,6 +47,9 @@ class ModelConfig(object):
     self.testing_percentile = testing_percentile
     self.training_percentile = training_percentile
     self.ensemble = ensemble
+    self.use_prefetch = use_prefetch
+    assert precision in ['fp32', 'fp16', 'bf16']
+    self.precision = precision
     self.device = device
 
     # Model Parameters
@@ -34,6 +57,7 @@ class ModelConfig(object):
     self.state_hsize = state_hsize
     self.dilations = dilations
     self.add_nl_layer = add_nl_layer
+    self.gradient_checkpointing = gradient_checkpointing
     self.random_seed = random_seed
 
     # Data Parameters
@@ -8,10 +8,17 @@ class Batch():
     exogenous_size = mc.exogenous_size
     device = mc.device
 
+    # Pinned staging buffers let the H2D copies below run
+    # asynchronously off the compute stream
+    pin = 'cuda' in str(device)
+
     # y: time series values
     n = len(y)
     y = np.float32(y)
-    self.idxs = torch.LongTensor(idxs).to(device)
+    self.idxs = torch.LongTensor(idxs)
+    if pin:
+      self.idxs = self.idxs.pin_memory()
+    self.idxs = self.idxs.to(device, non_blocking=True)
     self.y = y
     if (self.y.shape[1] > mc.max_series_length):
         y = y[:, -mc.max_series_length:]
@@ -28,8 +35,11 @@ class Batch():
       self.categories[rows_idx, cols_idx] = 1
       self.categories = torch.from_numpy(self.categories).float()
 
-    self.y = self.y.to(device)
-    self.categories = self.categories.to(device)
+    if pin:
+      self.y = self.y.pin_memory()
+      self.categories = self.categories.pin_memory()
+    self.y = self.y.to(device, non_blocking=True)
+    self.categories = self.categories.to(device, non_blocking=True)
 
 
 class Iterator(object):
@@ -77,10 +87,11 @@ class Iterator(object):
     # Initialize batch iterator
     self.b = 0
     self.n_batches = int(np.ceil(self.n_series / self.batch_size))
-    shuffle = list(range(self.n_series))
-    self.sort_key = {'unique_id': [self.unique_idxs[i] for i in shuffle],
-                     'sort_key': shuffle}
-  
+    # Presentation order kept as a permutation over the static arrays
+    self.perm = np.arange(self.n_series)
+    self.sort_key = {'unique_id': self.unique_idxs[self.perm],
+                     'sort_key': self.perm}
+
   def update_batch_size(self, new_batch_size):
     self.batch_size = new_batch_size
     assert self.batch_size <= self.n_series
@@ -91,33 +102,30 @@ class Iterator(object):
     # Random Seed
     np.random.seed(random_seed)
     self.random_seed = random_seed
+    # Compose the permutation instead of reordering X and y in memory
     shuffle = np.random.choice(self.n_series, self.n_series, replace=False)
-    self.X = self.X[shuffle]
-    self.y = self.y[shuffle]
-
-    old_sort_key = self.sort_key['sort_key']
-    old_unique_idxs = self.sort_key['unique_id']
-    self.sort_key = {'unique_id': [old_unique_idxs[i] for i in shuffle],
-                     'sort_key': [old_sort_key[i] for i in shuffle]}
+    self.perm = self.perm[shuffle]
+    self.sort_key = {'unique_id': self.unique_idxs[self.perm],
+                     'sort_key': self.perm}
 
   def get_trim_batch(self, unique_id):
     if unique_id==None:
       # Compute the indexes of the minibatch.
       first = (self.b * self.batch_size)
       last = min((first + self.batch_size), self.n_series)
+      batch_perm = self.perm[first:last]
     else:
-      # Obtain unique_id index
-      assert unique_id in self.sort_key['unique_id'], "unique_id, not fitted"
-      first = self.sort_key['unique_id'].index(unique_id)
-      last = first+1
+      # Obtain unique_id index (X rows are sorted by unique_id)
+      assert unique_id in self.unique_idxs, "unique_id, not fitted"
+      batch_perm = np.array([np.searchsorted(self.unique_idxs, unique_id)])
 
     # Extract values for batch
-    unique_idxs = self.sort_key['unique_id'][first:last]
-    batch_idxs = self.sort_key['sort_key'][first:last]
+    unique_idxs = self.unique_idxs[batch_perm]
+    batch_idxs = batch_perm
 
-    batch_y = self.y[first:last]
-    batch_categories = self.X[first:last, 1]
-    batch_last_ds = self.X[first:last, 2]
+    batch_y = self.y[batch_perm]
+    batch_categories = self.X[batch_perm, 1]
+    batch_last_ds = self.X[batch_perm, 2]
 
     len_series = np.count_nonzero(~np.isnan(batch_y), axis=1)
     min_len = min(len_series)
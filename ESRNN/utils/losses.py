@@ -55,13 +55,9 @@ class LevelVariabilityLoss(nn.Module):
 
   def forward(self, levels):
     assert levels.shape[1] > 2
-    level_prev = torch.log(levels[:, :-1])
-    level_next = torch.log(levels[:, 1:])
-    log_diff_of_levels = torch.sub(level_prev, level_next)
-
-    log_diff_prev = log_diff_of_levels[:, :-1]
-    log_diff_next = log_diff_of_levels[:, 1:]
-    diff = torch.sub(log_diff_prev, log_diff_next)
+    # Second difference of the log levels, computing the log once
+    log_levels = torch.log(levels)
+    diff = log_levels[:, :-2] - 2*log_levels[:, 1:-1] + log_levels[:, 2:]
     level_var_loss = diff**2
     level_var_loss = level_var_loss.mean() * self.level_variability_penalty
     return level_var_loss
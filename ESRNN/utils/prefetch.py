@@ -0,0 +1,51 @@
+import queue
+import threading
+
+
+class DataPrefetcher(object):
+  """ Background Batch Prefetcher.
+
+  Wraps a dataloader and assembles its batches in a background
+  thread, so that the next batch (window sampling, noise injection
+  and tensor construction) is prepared while the current batch is
+  being consumed by the training step.
+
+  Parameters
+  ----------
+  dataloader: Iterator object
+    dataloader with a get_batch() method, as defined by the
+    Iterator class in ESRNN/utils/data.py.
+  n_batches: int
+    number of batches to produce, usually dataloader.n_batches.
+  queue_size: int
+    maximum number of batches staged ahead of consumption.
+
+  Returns
+  ----------
+  self : object
+    Iterable over the next n_batches batches of the dataloader.
+  """
+  def __init__(self, dataloader, n_batches, queue_size=2):
+    self.dataloader = dataloader
+    self.n_batches = n_batches
+    self.queue = queue.Queue(maxsize=queue_size)
+    self.thread = threading.Thread(target=self._produce, daemon=True)
+    self.thread.start()
+
+  def _produce(self):
+    try:
+      for _ in range(self.n_batches):
+        self.queue.put(self.dataloader.get_batch())
+    except Exception as e:
+      self.queue.put(e)
+
+  def __iter__(self):
+    for _ in range(self.n_batches):
+      batch = self.queue.get()
+      if isinstance(batch, Exception):
+        raise batch
+      yield batch
+    self.thread.join()
+
+  def __len__(self):
+    return self.n_batches